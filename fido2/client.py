@@ -35,15 +35,26 @@ from .ctap2 import (CTAP2, PinProtocolV1, AttestationObject, AssertionResponse,
 from .cose import ES256
 from .rpid import verify_rp_id, verify_app_id
 from .utils import Timeout, sha256, hmac_sha256, websafe_decode, websafe_encode
+from collections import OrderedDict
 from enum import Enum, IntEnum, unique
 import json
 import six
 
 
+# Serialization templates for the fixed ClientData schemas built by the
+# clients below. The two variable fields are still encoded with json.dumps
+# to preserve JSON string escaping.
+_TMPL_WEBAUTHN = '{{"type":{0},"clientExtensions":{{}},"challenge":{1},' \
+    '"origin":{2}}}'
+_TMPL_U2F = '{{"typ":{0},"challenge":{1},"origin":{2}}}'
+
+
 class ClientData(bytes):
     def __init__(self, _):
         super(ClientData, self).__init__()
         self.data = json.loads(self.decode())
+        self._b64 = None
+        self._hash = None
 
     def get(self, key):
         return self.data[key]
@@ -54,15 +65,45 @@ class ClientData(bytes):
 
     @property
     def b64(self):
-        return websafe_encode(self)
+        # Safe to memoize since the underlying bytes are immutable.
+        if self._b64 is None:
+            self._b64 = websafe_encode(self)
+        return self._b64
 
     @property
     def hash(self):
-        return sha256(self)
+        if self._hash is None:
+            self._hash = sha256(self)
+        return self._hash
 
     @classmethod
     def build(cls, **kwargs):
-        return cls(json.dumps(kwargs).encode())
+        keys = set(kwargs)
+        if keys == {'typ', 'challenge', 'origin'}:
+            serialized = _TMPL_U2F.format(
+                json.dumps(kwargs['typ']),
+                json.dumps(kwargs['challenge']),
+                json.dumps(kwargs['origin'])
+            )
+        elif keys == {'type', 'clientExtensions', 'challenge', 'origin'} \
+                and kwargs['clientExtensions'] == {}:
+            serialized = _TMPL_WEBAUTHN.format(
+                json.dumps(kwargs['type']),
+                json.dumps(kwargs['challenge']),
+                json.dumps(kwargs['origin'])
+            )
+        else:
+            serialized = json.dumps(kwargs)
+        return cls._from_serialized(serialized.encode(), kwargs)
+
+    @classmethod
+    def _from_serialized(cls, serialized, data):
+        # The serialized form came from data, so skip __init__'s parse.
+        obj = bytes.__new__(cls, serialized)
+        obj.data = data
+        obj._b64 = None
+        obj._hash = None
+        return obj
 
     @classmethod
     def from_b64(cls, data):
@@ -75,6 +116,39 @@ class ClientData(bytes):
         return self.decode()
 
 
+def _u2f_data_builder(typ, origin):
+    """Returns a ClientData builder specialized on a fixed typ and origin,
+    so only the challenge is encoded per call."""
+    enc_typ = json.dumps(typ)
+    enc_origin = json.dumps(origin)
+
+    def build(challenge):
+        serialized = _TMPL_U2F.format(
+            enc_typ, json.dumps(challenge), enc_origin)
+        return ClientData._from_serialized(
+            serialized.encode(),
+            {'typ': typ, 'challenge': challenge, 'origin': origin}
+        )
+    return build
+
+
+def _webauthn_data_builder(type_, origin):
+    """Returns a ClientData builder specialized on a fixed type and origin,
+    so only the challenge is encoded per call."""
+    enc_type = json.dumps(type_)
+    enc_origin = json.dumps(origin)
+
+    def build(challenge):
+        serialized = _TMPL_WEBAUTHN.format(
+            enc_type, json.dumps(challenge), enc_origin)
+        return ClientData._from_serialized(
+            serialized.encode(),
+            {'type': type_, 'clientExtensions': {}, 'challenge': challenge,
+             'origin': origin}
+        )
+    return build
+
+
 class ClientError(Exception):
     @unique
     class ERR(IntEnum):
@@ -88,7 +162,9 @@ class ClientError(Exception):
             return ClientError(self, cause)
 
     def __init__(self, code, cause=None):
-        self.code = ClientError.ERR(code)
+        if not isinstance(code, ClientError.ERR):
+            code = ClientError.ERR(code)
+        self.code = code
         self.cause = cause
 
     def __repr__(self):
@@ -133,22 +209,39 @@ def _ctap2client_err(e):
     return ce(e)
 
 
+# Bound at module level to avoid repeated enum attribute lookups on hot
+# paths. The errors are factories, not instances; each raise still gets a
+# fresh ClientError.
+_USE_NOT_SATISFIED = APDU.USE_NOT_SATISFIED
+_ERR_OTHER_ERROR = ClientError.ERR.OTHER_ERROR
+_ERR_BAD_REQUEST = ClientError.ERR.BAD_REQUEST
+_ERR_DEVICE_INELIGIBLE = ClientError.ERR.DEVICE_INELIGIBLE
+_ERR_TIMEOUT = ClientError.ERR.TIMEOUT
+
+
+_MIN_POLL_DELAY = 0.025
+
+
 def _call_polling(poll_delay, timeout, on_keepalive, func, *args, **kwargs):
+    # Poll quickly at first for low tap-to-response latency, backing off
+    # towards poll_delay to keep the worst-case USB traffic bounded.
+    delay = min(poll_delay, _MIN_POLL_DELAY)
     with Timeout(timeout or 30) as event:
         while not event.is_set():
             try:
                 return func(*args, **kwargs)
             except ApduError as e:
-                if e.code == APDU.USE_NOT_SATISFIED:
+                if e.code == _USE_NOT_SATISFIED:
                     if on_keepalive:
                         on_keepalive(STATUS.UPNEEDED)
                         on_keepalive = None
-                    event.wait(poll_delay)
+                    event.wait(delay)
+                    delay = min(delay * 1.5, poll_delay)
                 else:
-                    raise ClientError.ERR.OTHER_ERROR(e)
+                    raise _ERR_OTHER_ERROR(e)
             except CtapError as e:
                 raise _ctap2client_err(e)
-    raise ClientError.ERR.TIMEOUT()
+    raise _ERR_TIMEOUT()
 
 
 @unique
@@ -157,56 +250,99 @@ class U2F_TYPE(six.text_type, Enum):
     SIGN = 'navigator.id.getAssertion'
 
 
+_DUMMY_PARAM = b'\0' * 32
+
+
 class U2fClient(object):
     def __init__(self, device, origin, verify=verify_app_id):
         self.poll_delay = 0.25
         self.ctap = CTAP1(device)
         self.origin = origin
         self._verify = verify
+        self._app_param_cache = {}
+        self._key_handle_cache = {}
+        self._verified_ids = set()
+        self._ctap1_version = None
+        self._build_register_data = _u2f_data_builder(
+            U2F_TYPE.REGISTER, origin)
+        self._build_sign_data = _u2f_data_builder(U2F_TYPE.SIGN, origin)
+
+    def _get_version(self):
+        # The version is static, so only query the device once.
+        if self._ctap1_version is None:
+            self._ctap1_version = self.ctap.get_version()
+        return self._ctap1_version
+
+    def _app_param(self, app_id):
+        app_param = self._app_param_cache.get(app_id)
+        if app_param is None:
+            if len(self._app_param_cache) > 32:  # Bound the cache size
+                self._app_param_cache.clear()
+            app_param = sha256(app_id.encode())
+            self._app_param_cache[app_id] = app_param
+        return app_param
+
+    def _key_handle(self, encoded):
+        key_handle = self._key_handle_cache.get(encoded)
+        if key_handle is None:
+            if len(self._key_handle_cache) > 32:  # Bound the cache size
+                self._key_handle_cache.clear()
+            key_handle = websafe_decode(encoded)
+            self._key_handle_cache[encoded] = key_handle
+        return key_handle
 
     def _verify_app_id(self, app_id):
+        # Verification parses URLs but is pure per (origin, app_id), so
+        # remember app_ids which have already passed.
+        if app_id in self._verified_ids:
+            return
         try:
             if self._verify(app_id, self.origin):
+                if len(self._verified_ids) > 32:  # Bound the cache size
+                    self._verified_ids.clear()
+                self._verified_ids.add(app_id)
                 return
         except Exception:
             pass  # Fall through to ClientError
-        raise ClientError.ERR.BAD_REQUEST()
+        raise _ERR_BAD_REQUEST()
 
     def register(self, app_id, register_requests, registered_keys, timeout=None,
                  on_keepalive=None):
         self._verify_app_id(app_id)
 
-        version = self.ctap.get_version()
-        dummy_param = b'\0' * 32
+        version = self._get_version()
+        # Group keys by appId so each one is verified and hashed only once.
+        # Ordered so keys are checked in first-occurrence order on all
+        # supported Python versions.
+        grouped_keys = OrderedDict()
         for key in registered_keys:
             if key['version'] != version:
                 continue
-            key_app_id = key.get('appId', app_id)
-            app_param = sha256(key_app_id.encode())
-            self._verify_app_id(key_app_id)
-            key_handle = websafe_decode(key['keyHandle'])
-            try:
-                self.ctap.authenticate(dummy_param, app_param, key_handle, True)
-                raise ClientError.ERR.DEVICE_INELIGIBLE()  # Bad response
-            except ApduError as e:
-                if e.code == APDU.USE_NOT_SATISFIED:
-                    raise ClientError.ERR.DEVICE_INELIGIBLE()
-            except CtapError as e:
-                raise _ctap2client_err(e)
-
-        for request in register_requests:
-            if request['version'] == version:
-                challenge = request['challenge']
-                break
-        else:
-            raise ClientError.ERR.DEVICE_INELIGIBLE()
+            grouped_keys.setdefault(key.get('appId', app_id), []).append(key)
 
-        client_data = ClientData.build(
-            typ=U2F_TYPE.REGISTER,
-            challenge=challenge,
-            origin=self.origin
-        )
-        app_param = sha256(app_id.encode())
+        for key_app_id, keys in grouped_keys.items():
+            if key_app_id != app_id:  # app_id itself is already verified.
+                self._verify_app_id(key_app_id)
+            app_param = self._app_param(key_app_id)
+            for key in keys:
+                key_handle = self._key_handle(key['keyHandle'])
+                try:
+                    self.ctap.authenticate(
+                        _DUMMY_PARAM, app_param, key_handle, True)
+                    raise _ERR_DEVICE_INELIGIBLE()  # Bad response
+                except ApduError as e:
+                    if e.code == _USE_NOT_SATISFIED:
+                        raise _ERR_DEVICE_INELIGIBLE()
+                except CtapError as e:
+                    raise _ctap2client_err(e)
+
+        challenge = next((req['challenge'] for req in register_requests
+                          if req['version'] == version), None)
+        if challenge is None:
+            raise _ERR_DEVICE_INELIGIBLE()
+
+        client_data = self._build_register_data(challenge)
+        app_param = self._app_param(app_id)
 
         reg_data = _call_polling(
             self.poll_delay, timeout, on_keepalive, self.ctap.register,
@@ -220,19 +356,16 @@ class U2fClient(object):
 
     def sign(self, app_id, challenge, registered_keys, timeout=None,
              on_keepalive=None):
-        client_data = ClientData.build(
-            typ=U2F_TYPE.SIGN,
-            challenge=challenge,
-            origin=self.origin
-        )
+        client_data = self._build_sign_data(challenge)
 
-        version = self.ctap.get_version()
+        version = self._get_version()
+        signature_data = None
         for key in registered_keys:
             if key['version'] == version:
                 key_app_id = key.get('appId', app_id)
                 self._verify_app_id(key_app_id)
-                key_handle = websafe_decode(key['keyHandle'])
-                app_param = sha256(key_app_id.encode())
+                key_handle = self._key_handle(key['keyHandle'])
+                app_param = self._app_param(key_app_id)
                 try:
                     signature_data = _call_polling(
                         self.poll_delay, timeout, on_keepalive,
@@ -242,8 +375,8 @@ class U2fClient(object):
                     break
                 except ClientError:
                     pass  # Ignore and try next key
-        else:
-            raise ClientError.ERR.DEVICE_INELIGIBLE()
+        if signature_data is None:
+            raise _ERR_DEVICE_INELIGIBLE()
 
         return {
             'clientData': client_data.b64,
@@ -266,6 +399,12 @@ class Fido2Client(object):
         self.ctap1_poll_delay = 0.25
         self.origin = origin
         self._verify = verify
+        self._app_param_cache = {}
+        self._verified_ids = set()
+        self._build_create_data = _webauthn_data_builder(
+            WEBAUTHN_TYPE.MAKE_CREDENTIAL, origin)
+        self._build_get_data = _webauthn_data_builder(
+            WEBAUTHN_TYPE.GET_ASSERTION, origin)
         try:
             self.ctap2 = CTAP2(device)
             self.info = self.ctap2.get_info()
@@ -281,13 +420,29 @@ class Fido2Client(object):
             self._do_make_credential = self._ctap1_make_credential
             self._do_get_assertion = self._ctap1_get_assertion
 
+    def _app_param(self, rp_id):
+        app_param = self._app_param_cache.get(rp_id)
+        if app_param is None:
+            if len(self._app_param_cache) > 32:  # Bound the cache size
+                self._app_param_cache.clear()
+            app_param = sha256(rp_id.encode())
+            self._app_param_cache[rp_id] = app_param
+        return app_param
+
     def _verify_rp_id(self, rp_id):
+        # Verification parses URLs but is pure per (origin, rp_id), so
+        # remember rp_ids which have already passed.
+        if rp_id in self._verified_ids:
+            return
         try:
             if self._verify(rp_id, self.origin):
+                if len(self._verified_ids) > 32:  # Bound the cache size
+                    self._verified_ids.clear()
+                self._verified_ids.add(rp_id)
                 return
         except Exception:
             pass  # Fall through to ClientError
-        raise ClientError.ERR.BAD_REQUEST()
+        raise _ERR_BAD_REQUEST()
 
     def make_credential(self, rp, user, challenge, algos=[ES256.ALGORITHM],
                         exclude_list=None, extensions=None, rk=False, uv=False,
@@ -295,12 +450,7 @@ class Fido2Client(object):
 
         self._verify_rp_id(rp['id'])
 
-        client_data = ClientData.build(
-            type=WEBAUTHN_TYPE.MAKE_CREDENTIAL,
-            clientExtensions={},
-            challenge=challenge,
-            origin=self.origin
-        )
+        client_data = self._build_create_data(challenge)
 
         try:
             return self._do_make_credential(
@@ -340,7 +490,7 @@ class Fido2Client(object):
         # Reject the request if too many credentials remain.
         max_creds = self.info.max_creds_in_list
         if max_creds and len(exclude_list or ()) > max_creds:
-            raise ClientError.ERR.BAD_REQUEST('exclude_list too long')
+            raise _ERR_BAD_REQUEST('exclude_list too long')
 
         return self.ctap2.make_credential(client_data.hash, rp, user,
                                           key_params, exclude_list,
@@ -352,20 +502,20 @@ class Fido2Client(object):
         if rk or uv or ES256.ALGORITHM not in algos:
             raise CtapError(CtapError.ERR.UNSUPPORTED_OPTION)
 
-        app_param = sha256(rp['id'].encode())
+        app_param = self._app_param(rp['id'])
 
-        dummy_param = b'\0' * 32
         for cred in exclude_list or []:
             key_handle = cred['id']
             try:
                 self.ctap1.authenticate(
-                    dummy_param, app_param, key_handle, True)
-                raise ClientError.ERR.OTHER_ERROR()  # Shouldn't happen
+                    _DUMMY_PARAM, app_param, key_handle, True)
+                raise _ERR_OTHER_ERROR()  # Shouldn't happen
             except ApduError as e:
-                if e.code == APDU.USE_NOT_SATISFIED:
+                if e.code == _USE_NOT_SATISFIED:
                     _call_polling(self.ctap1_poll_delay, timeout, on_keepalive,
-                                  self.ctap1.register, dummy_param, dummy_param)
-                    raise ClientError.ERR.DEVICE_INELIGIBLE()
+                                  self.ctap1.register, _DUMMY_PARAM,
+                                  _DUMMY_PARAM)
+                    raise _ERR_DEVICE_INELIGIBLE()
 
         return AttestationObject.from_ctap1(
             app_param,
@@ -379,12 +529,7 @@ class Fido2Client(object):
 
         self._verify_rp_id(rp_id)
 
-        client_data = ClientData.build(
-            type=WEBAUTHN_TYPE.GET_ASSERTION,
-            clientExtensions={},
-            challenge=challenge,
-            origin=self.origin
-        )
+        client_data = self._build_get_data(challenge)
 
         try:
             return self._do_get_assertion(
@@ -423,7 +568,7 @@ class Fido2Client(object):
         # Reject the request if too many credentials remain.
         max_creds = self.info.max_creds_in_list
         if max_creds and len(allow_list) > max_creds:
-            raise ClientError.ERR.BAD_REQUEST('allow_list too long')
+            raise _ERR_BAD_REQUEST('allow_list too long')
 
         return self.ctap2.get_assertions(
             rp_id, client_data.hash, allow_list, extensions, options, pin_auth,
@@ -435,7 +580,7 @@ class Fido2Client(object):
         if (not up) or uv or not allow_list:
             raise CtapError(CtapError.ERR.UNSUPPORTED_OPTION)
 
-        app_param = sha256(rp_id.encode())
+        app_param = self._app_param(rp_id)
         client_param = client_data.hash
         for cred in allow_list:
             try:
@@ -447,6 +592,6 @@ class Fido2Client(object):
                     AssertionResponse.from_ctap1(app_param, cred, auth_resp)
                 ]
             except ClientError as e:
-                if e.code == ClientError.ERR.TIMEOUT:
+                if e.code == _ERR_TIMEOUT:
                     raise  # Other errors are ignored so we move to the next.
-        raise ClientError.ERR.DEVICE_INELIGIBLE()
+        raise _ERR_DEVICE_INELIGIBLE()
@@ -64,6 +64,9 @@ def hexstr(bs):
     return "h'%s'" % b2a_hex(bs).decode()
 
 
+_ZERO_AAGUID = b'\0' * 16
+
+
 class Info(bytes):
     """Binary CBOR encoded response data returned by the CTAP2 GET_INFO command.
 
@@ -219,7 +222,7 @@ class AttestedCredentialData(bytes):
         :rtype: AttestedCredentialData
         """
         return cls.create(
-            b'\0'*16,  # AAGUID
+            _ZERO_AAGUID,
             key_handle,
             ES256.from_ctap1(public_key)
         )
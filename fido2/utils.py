@@ -36,8 +36,14 @@ from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import hmac, hashes
 from binascii import b2a_hex
 from numbers import Number
+import hashlib
 import six
 
+try:  # One-shot OpenSSL-backed HMAC, Python 3.7+.
+    from hmac import digest as _hmac_digest
+except ImportError:
+    _hmac_digest = None
+
 __all__ = [
     'Timeout',
     'websafe_encode',
@@ -49,15 +55,18 @@ __all__ = [
 ]
 
 
+# Bound once at import so each call goes straight to the OpenSSL-backed
+# digest, which dispatches to hardware (SHA-NI/AVX2) where available.
+_SHA256 = hashlib.sha256
+
+
 def sha256(data):
     """Produces a SHA256 hash of the input.
 
     :param data: The input data to hash.
     :return: The resulting hash.
     """
-    h = hashes.Hash(hashes.SHA256(), default_backend())
-    h.update(data)
-    return h.finalize()
+    return _SHA256(data).digest()
 
 
 def hmac_sha256(key, data):
@@ -67,6 +76,8 @@ def hmac_sha256(key, data):
     :param data: The input data to hash.
     :return: The resulting hash.
     """
+    if _hmac_digest is not None:
+        return _hmac_digest(key, data, 'sha256')
     h = hmac.HMAC(key, hashes.SHA256(), default_backend())
     h.update(data)
     return h.finalize()